@@ -3,9 +3,11 @@
 goat_bluesky_to_atlas.py  ──  turn a Bluesky repo dump (GOAT export)
 into a JSONL ready for Nomic Atlas semantic search + thread filters
 """
-import json, os, sys
+import argparse, json, os
 from collections import defaultdict
 
+from post_index import PostIndex, parse_size
+
 # ---------- helpers reused from your existing script ----------
 def read_json(fp):
 	with open(fp, "r") as f:
@@ -58,6 +60,18 @@ def annotate_threads(posts, idx):
 		p["depth"] = depth
 	return posts
 
+# ---------- same annotations, streamed from an on-disk index ----------
+def stream_annotated(index):
+	# one post in memory at a time, emitted in walk_posts order
+	index.annotate()
+	for row in index.annotated():
+		p = read_json(row["path"])
+		p["rkey"] = row["rkey"]
+		p["thread_id"] = row["thread_id"]
+		p["parent_id"] = row["parent"]
+		p["depth"] = row["depth"]
+		yield p
+
 # ---------- emit JSON-lines ----------
 def write_jsonl(posts):
 	for p in posts:
@@ -71,9 +85,19 @@ def write_jsonl(posts):
 		}, ensure_ascii=False))
 
 if __name__ == "__main__":
-	repo_root = sys.argv[1]			  # path to repo export dir
-	posts = list(walk_posts(repo_root))
-	idx = index_by_rkey(posts)
-	attach_children(posts, idx)
-	annotate_threads(posts, idx)
-	write_jsonl(posts)
+	parser = argparse.ArgumentParser(description="Bluesky repo export -> Nomic Atlas JSONL")
+	parser.add_argument("repo_root", help="path to repo export dir")
+	parser.add_argument("--max-memory", type=parse_size,
+		help="stream from an on-disk index instead of loading every post (e.g. 512M); "
+			"sizes the index cache, with one post and the interpreter on top")
+	args = parser.parse_args()
+	if args.max_memory:
+		post_dir = os.path.join(args.repo_root, "app.bsky.feed.post")
+		with PostIndex(post_dir, args.max_memory) as index:
+			write_jsonl(stream_annotated(index))
+	else:
+		posts = list(walk_posts(args.repo_root))
+		idx = index_by_rkey(posts)
+		attach_children(posts, idx)
+		annotate_threads(posts, idx)
+		write_jsonl(posts)
@@ -0,0 +1,165 @@
+"""
+post_index.py  ──  compact on-disk index of a Bluesky repo dump (GOAT export)
+so thread_replies.py / embed_atlas.py can stream archives larger than RAM
+"""
+import json, os, sqlite3, tempfile
+
+BATCH_SIZE = 5000
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+def read_json(fp):
+	with open(fp, "r") as f:
+		return json.load(f)
+
+def parse_size(text):
+	# "512M", "2G", "1.5GB" or plain bytes
+	size = text.strip().upper().rstrip("B")
+	scale = SIZE_SUFFIXES.get(size[-1:], 1)
+	if scale > 1:
+		size = size[:-1]
+	return int(float(size) * scale)
+
+def parent_key(post):
+	if "reply" in post and "parent" in post["reply"]:
+		return post["reply"]["parent"]["uri"].split("/")[-1]
+	return None
+
+def quoted_key(post):
+	embed = post.get("embed", {})
+	if embed.get("$type") == "app.bsky.embed.record":
+		return embed["record"]["uri"].split("/")[-1]
+	if embed.get("$type") == "app.bsky.embed.recordWithMedia":
+		return embed["record"]["record"]["uri"].split("/")[-1]
+	return None
+
+class PostIndex:
+	"""rkey, parent, quote and createdAt of every post, kept in a temporary
+	SQLite file; post bodies are re-read from disk on demand. SQLite's page
+	cache and sorter buffers are held to sqlite_budget, half of max_memory,
+	leaving the rest for the caller."""
+
+	def __init__(self, post_dir, max_memory):
+		self._tmp = tempfile.TemporaryDirectory(prefix="bsky-index-")
+		self.db = sqlite3.connect(os.path.join(self._tmp.name, "index.db"))
+		self.db.row_factory = sqlite3.Row
+		# negative cache_size is in KiB: give the page cache a quarter of the
+		# budget and let the heap (sorter included) grow to half before spilling
+		self.sqlite_budget = max_memory // 2
+		self.db.execute(f"PRAGMA cache_size = {-max(max_memory // 4096, 256)}")
+		self.db.execute(f"PRAGMA soft_heap_limit = {self.sqlite_budget}")
+		self.db.execute("PRAGMA temp_store = FILE")
+		self.db.execute("PRAGMA journal_mode = OFF")
+		self.db.execute("PRAGMA synchronous = OFF")
+		self._load(post_dir)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		self.db.close()
+		self._tmp.cleanup()
+
+	# ---------- build ----------
+	def _load(self, post_dir):
+		# seq is the os.walk position, i.e. the order the in-memory readers see
+		self.db.execute("""CREATE TABLE posts (
+			seq INTEGER PRIMARY KEY, rkey TEXT, created_at TEXT,
+			path TEXT, parent TEXT, quoted TEXT)""")
+		rows = []
+		for root, _, files in os.walk(post_dir):
+			for fname in files:
+				path = os.path.join(root, fname)
+				post = read_json(path)
+				rows.append((os.path.splitext(fname)[0], post["createdAt"], path,
+					parent_key(post), quoted_key(post)))
+				if len(rows) >= BATCH_SIZE:
+					self._insert(rows)
+					rows = []
+		self._insert(rows)
+		self.db.execute("CREATE INDEX posts_rkey ON posts (rkey, seq)")
+
+	def _insert(self, rows):
+		self.db.executemany(
+			"INSERT INTO posts (rkey, created_at, path, parent, quoted) VALUES (?, ?, ?, ?, ?)",
+			rows)
+
+	def sort(self, limit=None):
+		"""Number posts by (createdAt, walk order) -- the same result as the
+		stable in-memory sort -- keep the last `limit`, and resolve reply and
+		quote links within that window. SQLite's sorter is an external merge
+		sort, so this spills to temp files instead of growing past the cache."""
+		self.db.executescript("""
+			CREATE TABLE timeline (
+				pos INTEGER PRIMARY KEY, rkey TEXT, path TEXT, parent TEXT,
+				quoted TEXT, parent_pos INTEGER, quoted_pos INTEGER);
+			INSERT INTO timeline (rkey, path, parent, quoted)
+				SELECT rkey, path, parent, quoted FROM posts ORDER BY created_at, seq;
+		""")
+		total = self.db.execute("SELECT COUNT(*) FROM timeline").fetchone()[0]
+		if limit and total > limit:
+			self.db.execute("DELETE FROM timeline WHERE pos <= ?", (total - limit,))
+		# a repeated rkey resolves to its last occurrence, like a dict would
+		self.db.executescript("""
+			CREATE INDEX timeline_rkey ON timeline (rkey, pos);
+			UPDATE timeline SET parent_pos =
+				(SELECT MAX(t.pos) FROM timeline t WHERE t.rkey = timeline.parent)
+				WHERE parent IS NOT NULL;
+			UPDATE timeline SET quoted_pos =
+				(SELECT MAX(t.pos) FROM timeline t WHERE t.rkey = timeline.quoted)
+				WHERE quoted IS NOT NULL;
+			CREATE INDEX timeline_parent ON timeline (parent_pos, pos);
+			CREATE INDEX timeline_quoted ON timeline (quoted_pos, pos);
+		""")
+
+	def annotate(self):
+		"""Store each post's thread root and reply depth, following parent links
+		across the whole dump the way embed_atlas.annotate_threads does. One
+		recursive query walks every thread top-down from its root, instead of
+		climbing each post's ancestors separately."""
+		self.db.executescript("""
+			ALTER TABLE posts ADD COLUMN parent_seq INTEGER;
+			UPDATE posts SET parent_seq =
+				(SELECT MAX(p.seq) FROM posts p WHERE p.rkey = posts.parent)
+				WHERE parent IS NOT NULL;
+			CREATE INDEX posts_parent ON posts (parent_seq);
+			CREATE TABLE threads (seq INTEGER PRIMARY KEY, thread_id TEXT, depth INTEGER);
+			INSERT INTO threads
+				WITH RECURSIVE walk (seq, thread_id, depth) AS (
+					SELECT seq, rkey, 0 FROM posts WHERE parent_seq IS NULL
+					UNION ALL
+					SELECT p.seq, walk.thread_id, walk.depth + 1
+						FROM posts p JOIN walk ON p.parent_seq = walk.seq
+				)
+				SELECT seq, thread_id, depth FROM walk;
+		""")
+
+	# ---------- queries over the whole dump ----------
+	def annotated(self):
+		# after annotate(); a post in a reply cycle has no root and stands alone
+		return self.db.execute("""
+			SELECT p.rkey, p.path, p.parent,
+				COALESCE(t.thread_id, p.rkey) AS thread_id, COALESCE(t.depth, 0) AS depth
+			FROM posts p LEFT JOIN threads t USING (seq) ORDER BY p.seq""")
+
+	# ---------- queries over the sorted timeline (after sort()) ----------
+	def get(self, pos):
+		return self.db.execute("SELECT * FROM timeline WHERE pos = ?", (pos,)).fetchone()
+
+	def roots(self):
+		# not a reply to anything inside the window, in chronological order
+		return self.db.execute("SELECT * FROM timeline WHERE parent_pos IS NULL ORDER BY pos")
+
+	def replies(self, pos):
+		return self.db.execute(
+			"SELECT * FROM timeline WHERE parent_pos = ? ORDER BY pos", (pos,)).fetchall()
+
+	def has_replies(self, pos):
+		return self.db.execute(
+			"SELECT 1 FROM timeline WHERE parent_pos = ? LIMIT 1", (pos,)).fetchone() is not None
+
+	def quoters(self, pos):
+		return self.db.execute(
+			"SELECT * FROM timeline WHERE quoted_pos = ? ORDER BY pos", (pos,)).fetchall()
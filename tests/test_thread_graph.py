@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(__file__), os.pardir, "thread_graph.py")
+GEXF = "{http://gexf.net/1.3}"
+
+
+def uri(rkey):
+    return f"at://did:plc:me/app.bsky.feed.post/{rkey}"
+
+
+@pytest.fixture
+def archive(tmp_path):
+    # Two days of threads linked by replies and quotes, some of which cross
+    # the --since/--until window used below
+    posts = {
+        "a": {"createdAt": "2024-03-01T10:00:00Z"},
+        "b": {"createdAt": "2024-03-02T10:00:00Z", "reply": {"parent": {"uri": uri("a")}}},
+        "c": {"createdAt": "2024-03-02T11:00:00Z", "reply": {"parent": {"uri": uri("b")}}},
+        "d": {"createdAt": "2024-03-02T12:00:00Z",
+              "embed": {"$type": "app.bsky.embed.record", "record": {"uri": uri("b")}}},
+        "e": {"createdAt": "2024-03-03T09:00:00Z", "reply": {"parent": {"uri": uri("d")}}},
+        "f": {"createdAt": "2024-03-03T10:00:00Z",
+              "embed": {"$type": "app.bsky.embed.recordWithMedia",
+                        "record": {"record": {"uri": uri("a")}}}},
+        "g": {"createdAt": "2024-03-02T13:00:00Z", "reply": {"parent": {"uri": uri("elsewhere")}}},
+        "h": {"createdAt": "2024-03-04T08:00:00Z"},
+        "i": {"createdAt": "2024-03-04T09:00:00Z", "reply": {"parent": {"uri": uri("h")}}},
+    }
+    post_dir = tmp_path / "app.bsky.feed.post"
+    post_dir.mkdir()
+    for rkey, post in posts.items():
+        text = f'post "{rkey}" <&>\x01'
+        (post_dir / f"{rkey}.json").write_text(json.dumps({"text": text, **post}))
+    return tmp_path
+
+
+def run(*args):
+    return subprocess.run([sys.executable, SCRIPT, *map(str, args)],
+                          capture_output=True, text=True, check=True).stdout
+
+
+def gexf_graph(text):
+    graph = ElementTree.fromstring(text).find(f"{GEXF}graph")
+    nodes = {node.get("id") for node in graph.iter(f"{GEXF}node")}
+    edges = [(edge.get("source"), edge.get("target"), edge.get("label"))
+             for edge in graph.iter(f"{GEXF}edge")]
+    return nodes, edges
+
+
+def json_graph(text):
+    graph = json.loads(text)
+    nodes = {node["id"] for node in graph["nodes"]}
+    edges = [(edge["source"], edge["target"], edge["type"]) for edge in graph["edges"]]
+    return nodes, edges
+
+
+@pytest.mark.parametrize("fmt, parse", [("gexf", gexf_graph), ("json", json_graph)])
+def test_whole_account_export(archive, fmt, parse):
+    nodes, edges = parse(run(archive, "--format", fmt))
+    assert nodes == set("abcdefghi")
+    assert sorted(edges) == sorted([
+        ("a", "b", "reply"), ("b", "c", "reply"), ("d", "b", "quote"),
+        ("d", "e", "reply"), ("f", "a", "quote"), ("h", "i", "reply"),
+    ])
+
+
+@pytest.mark.parametrize("fmt, parse", [("gexf", gexf_graph), ("json", json_graph)])
+def test_date_window_keeps_edges_inside_it(archive, fmt, parse):
+    nodes, edges = parse(run(archive, "--format", fmt, "--since", "2024-03-02", "--until", "2024-03-03"))
+    assert nodes == set("bcdefg")
+    assert all(source in nodes and target in nodes for source, target, _ in edges)
+    assert sorted(edges) == sorted([("b", "c", "reply"), ("d", "b", "quote"), ("d", "e", "reply")])
+
+
+@pytest.mark.parametrize("rkey", ["a", "c", "e", "h"])
+def test_rkey_export_matches_mermaid(archive, rkey):
+    mermaid = run(archive, rkey)
+    mermaid_nodes = len(re.findall(r"^  n\d+\[", mermaid, re.MULTILINE))
+    mermaid_edges = len(re.findall(r"-->|\.->", mermaid))
+    nodes, edges = json_graph(run(archive, rkey, "--format", "json"))
+    assert (len(nodes), len(edges)) == (mermaid_nodes, mermaid_edges)
+    assert all(source in nodes and target in nodes for source, target, _ in edges)
+
+
+@pytest.mark.parametrize("args", [
+    ["--format", "json", "--since", "2024-3-2"],
+    ["a", "--since", "2024-03-02"],
+    [],
+])
+def test_rejects_bad_arguments(archive, args):
+    result = subprocess.run([sys.executable, SCRIPT, str(archive), *args], capture_output=True, text=True)
+    assert result.returncode == 2
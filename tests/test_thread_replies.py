@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(__file__), os.pardir, "thread_replies.py")
+CHAIN_LENGTH = 1500
+
+
+@pytest.fixture
+def self_reply_chain(tmp_path):
+    # One root post followed by a single self-reply chain deeper than the
+    # default recursion limit
+    post_dir = tmp_path / "app.bsky.feed.post"
+    profile_dir = tmp_path / "app.bsky.actor.profile"
+    post_dir.mkdir()
+    profile_dir.mkdir()
+    (profile_dir / "self.json").write_text(json.dumps({"displayName": "Bot", "description": "chain"}))
+    for i in range(CHAIN_LENGTH):
+        post = {"text": f"post {i}", "createdAt": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}.000Z"}
+        if i:
+            post["reply"] = {"parent": {"uri": f"at://did:plc:bot/app.bsky.feed.post/k{i - 1:05d}"}}
+        (post_dir / f"k{i:05d}.json").write_text(json.dumps(post))
+    return tmp_path
+
+
+def run(*args):
+    return subprocess.run([sys.executable, SCRIPT, *map(str, args)],
+                          capture_output=True, text=True, check=True).stdout
+
+
+@pytest.mark.parametrize("extra", [[], ["--max-memory", "8M"]])
+def test_chunks_deep_self_reply_chain(self_reply_chain, tmp_path, extra):
+    chunk_dir = tmp_path / "chunks"
+    run(self_reply_chain, "--chunk-dir", chunk_dir, "--jobs", 2, *extra)
+    text = "".join(path.read_text() for path in sorted(chunk_dir.iterdir()))
+    assert len(list(chunk_dir.iterdir())) == 1
+    assert f"post {CHAIN_LENGTH - 1} —2024-01-01" in text
+    assert text.count("↳") == sum(range(CHAIN_LENGTH))
+
+
+def test_stdout_deep_self_reply_chain(self_reply_chain):
+    assert run(self_reply_chain) == run(self_reply_chain, "--max-memory", "8M")
@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from thread_graph import build_relationships, parent_rkey, read_posts  # noqa: E402
+from thread_stats import compute_stats, read_links, relationship_arrays  # noqa: E402
+
+CHAIN_LENGTH = 300
+
+
+def uri(rkey):
+    return f"at://did:plc:me/app.bsky.feed.post/{rkey}"
+
+
+@pytest.fixture
+def archive(tmp_path):
+    posts = {}
+    # A self-reply chain deep enough for several pointer-doubling rounds
+    for i in range(CHAIN_LENGTH):
+        posts[f"c{i:04d}"] = {"createdAt": f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00.000Z"}
+        if i:
+            posts[f"c{i:04d}"]["reply"] = {"parent": {"uri": uri(f"c{i - 1:04d}")}}
+    # A quote cascade: qb and qd quote qa, qc quotes qb
+    posts["qa"] = {"createdAt": "2024-02-01T00:00:00Z"}
+    posts["qb"] = {"createdAt": "2024-02-01T01:00:00Z",
+                   "embed": {"$type": "app.bsky.embed.record", "record": {"uri": uri("qa")}}}
+    posts["qc"] = {"createdAt": "2024-02-01T02:00:00Z",
+                   "embed": {"$type": "app.bsky.embed.recordWithMedia",
+                             "record": {"record": {"uri": uri("qb")}}}}
+    posts["qd"] = {"createdAt": "2024-02-01T03:00:00Z",
+                   "embed": {"$type": "app.bsky.embed.record", "record": {"uri": uri("qa")}}}
+    # A reply to someone outside the archive
+    posts["ext"] = {"createdAt": "2024-03-01T00:00:00Z", "reply": {"parent": {"uri": uri("elsewhere")}}}
+    # A post without createdAt, replied to; a backdated post with a skewed reply
+    posts["nodate"] = {}
+    posts["nodate_reply"] = {"createdAt": "2024-04-01T00:00:00Z", "reply": {"parent": {"uri": uri("nodate")}}}
+    posts["old"] = {"createdAt": "0001-01-01T00:00:00Z"}
+    posts["old_reply"] = {"createdAt": "0001-01-01T00:05:00+00:00", "reply": {"parent": {"uri": uri("old")}}}
+    posts["skew"] = {"createdAt": "2024-05-01T00:00:10Z"}
+    posts["skew_reply"] = {"createdAt": "2024-05-01T00:00:00Z", "reply": {"parent": {"uri": uri("skew")}}}
+
+    post_dir = tmp_path / "app.bsky.feed.post"
+    post_dir.mkdir()
+    for rkey, post in posts.items():
+        (post_dir / f"{rkey}.json").write_text(json.dumps({"text": rkey, **post}))
+    return tmp_path
+
+
+def histogram(counter):
+    return {str(value): count for value, count in sorted(counter.items())}
+
+
+def parse(created_at):
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+
+
+def test_matches_build_relationships(archive):
+    stats = compute_stats(relationship_arrays(*read_links(str(archive))))
+
+    posts = read_posts(str(archive))
+    posts_by_rkey = {post["rkey"]: post for post in posts}
+    replies_by_parent, quotes_by_target, quotes_from_post = build_relationships(posts)
+
+    roots, depths = Counter(), Counter()
+    for post in posts:
+        depth = 0
+        while parent_rkey(post) in posts_by_rkey:
+            post = posts_by_rkey[parent_rkey(post)]
+            depth += 1
+        roots[post["rkey"]] += 1
+        if depth:
+            depths[depth] += 1
+    assert stats["thread_size"]["histogram"] == histogram(Counter(roots.values()))
+    assert stats["reply_depth"]["histogram"] == histogram(depths)
+    assert stats["reply_depth"]["max"] == CHAIN_LENGTH - 1
+
+    fan_out = Counter(len(quoters) for quoters in quotes_by_target.values())
+    assert stats["quote_fan_out"]["histogram"] == histogram(fan_out)
+    origins = Counter()
+    for rkey in quotes_from_post:
+        while rkey in quotes_from_post:
+            rkey = quotes_from_post[rkey][0]["rkey"]
+        origins[rkey] += 1
+    cascade_sizes = Counter(size + 1 for size in origins.values())
+    assert stats["quote_cascade_size"]["histogram"] == histogram(cascade_sizes)
+    assert stats["quotes"]["cascades"] == 1
+
+    # CHAIN_LENGTH - 1 chain replies, three other self-replies, one external
+    self_replies = CHAIN_LENGTH + 2
+    assert stats["replies"] == {"total": self_replies + 1, "self": self_replies, "external": 1,
+                                "self_ratio": round(self_replies / (self_replies + 1), 4)}
+    assert stats["posts"]["missing_created_at"] == 1
+
+    delays = []
+    for rkey, replies in replies_by_parent.items():
+        timed = [reply for reply in replies if reply.get("createdAt")]
+        if posts_by_rkey[rkey].get("createdAt") and timed:
+            first = min(parse(reply["createdAt"]) for reply in timed)
+            delays.append(max((first - parse(posts_by_rkey[rkey]["createdAt"])).total_seconds(), 0))
+    delay = stats["time_to_first_reply_seconds"]
+    assert delay["count"] == len(delays)
+    assert (delay["min"], delay["max"]) == (min(delays), max(delays))
+    assert delay["clock_skewed"] == 1
+    assert sum(delay["histogram"].values()) == len(delays)
@@ -4,8 +4,16 @@
 import argparse
 import json
 import os
+import re
+import sys
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from datetime import date
+from html import escape
+from json.encoder import encode_basestring
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+LABEL_LENGTH = 60
+XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
 
 def read_posts(directory: str) -> List[dict]:
@@ -183,9 +191,167 @@ def render_mermaid(
     return "\n".join(lines)
 
 
+def collect_network(
+    target: dict,
+    posts_by_rkey: Dict[str, dict],
+    replies_by_parent: Dict[str, List[dict]],
+    quotes_by_target: Dict[str, List[dict]],
+    quotes_from_post: Dict[str, List[dict]],
+) -> Set[str]:
+    """Return the rkeys of every post render_mermaid would draw for target."""
+    root_post, _ = find_thread_root(target, posts_by_rkey)
+    pending = [root_post["rkey"]]
+    pending.extend(post["rkey"] for post in quotes_by_target.get(target["rkey"], []))
+    visited: Set[str] = set()
+
+    while pending:
+        rkey = pending.pop()
+        if rkey in visited:
+            continue
+        visited.add(rkey)
+        pending.extend(reply["rkey"] for reply in replies_by_parent.get(rkey, []))
+        pending.extend(quoted["rkey"] for quoted in quotes_from_post.get(rkey, []))
+
+    return visited | {target["rkey"]}
+
+
+def graph_edges(
+    posts: Iterable[dict],
+    posts_by_rkey: Dict[str, dict],
+    keep: Callable[[dict], bool],
+) -> Iterator[Tuple[str, str, str]]:
+    """Yield (source, target, type) for each reply/quote link between kept posts.
+
+    Edges point the same way as in the Mermaid chart: parent to reply and
+    quoting post to quoted post.
+    """
+    for post in posts:
+        if not keep(post):
+            continue
+        parent = posts_by_rkey.get(parent_rkey(post) or "")
+        if parent and keep(parent):
+            yield parent["rkey"], post["rkey"], "reply"
+        for quoted_key in quoted_rkeys(post):
+            quoted = posts_by_rkey.get(quoted_key)
+            if quoted and keep(quoted):
+                yield post["rkey"], quoted["rkey"], "quote"
+
+
+def short_label(post: dict) -> str:
+    text = " ".join(post.get("text", "").split())
+    if len(text) > LABEL_LENGTH:
+        text = text[: LABEL_LENGTH - 1] + "…"
+    return text
+
+
+def dot_string(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def write_dot(handle: TextIO, nodes: Iterable[dict], edges: Iterable[Tuple[str, str, str]]) -> None:
+    handle.write("digraph bluesky {\n")
+    for post in nodes:
+        handle.write(
+            f"  {dot_string(post['rkey'])} [label={dot_string(short_label(post))}, "
+            f"created_at={dot_string(post.get('createdAt', ''))}];\n"
+        )
+    for source, target, edge_type in edges:
+        style = ", style=dashed" if edge_type == "quote" else ""
+        handle.write(f"  {dot_string(source)} -> {dot_string(target)} [type={edge_type}{style}];\n")
+    handle.write("}\n")
+
+
+def xml_attr(text: str) -> str:
+    return '"' + escape(XML_INVALID.sub("", text)) + '"'
+
+
+def write_gexf(handle: TextIO, nodes: Iterable[dict], edges: Iterable[Tuple[str, str, str]]) -> None:
+    handle.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+        '  <graph defaultedgetype="directed" mode="static">\n'
+        '    <attributes class="node">\n'
+        '      <attribute id="created_at" title="created_at" type="string"/>\n'
+        '    </attributes>\n'
+        '    <attributes class="edge">\n'
+        '      <attribute id="type" title="type" type="string"/>\n'
+        '    </attributes>\n'
+        '    <nodes>\n'
+    )
+    for post in nodes:
+        handle.write(
+            f'      <node id={xml_attr(post["rkey"])} label={xml_attr(short_label(post))}>'
+            f'<attvalues><attvalue for="created_at" value={xml_attr(post.get("createdAt", ""))}/>'
+            "</attvalues></node>\n"
+        )
+    handle.write("    </nodes>\n    <edges>\n")
+    for edge_id, (source, target, edge_type) in enumerate(edges):
+        handle.write(
+            f'      <edge id="{edge_id}" source={xml_attr(source)} target={xml_attr(target)} '
+            f'label="{edge_type}"><attvalues><attvalue for="type" value="{edge_type}"/>'
+            "</attvalues></edge>\n"
+        )
+    handle.write("    </edges>\n  </graph>\n</gexf>\n")
+
+
+def write_json(handle: TextIO, nodes: Iterable[dict], edges: Iterable[Tuple[str, str, str]]) -> None:
+    handle.write('{"nodes": [')
+    separator = "\n"
+    for post in nodes:
+        node_id = encode_basestring(post["rkey"])
+        created_at = encode_basestring(post.get("createdAt", ""))
+        handle.write(f'{separator}{{"id": {node_id}, "created_at": {created_at}}}')
+        separator = ",\n"
+    handle.write('\n], "edges": [')
+    separator = "\n"
+    for source, target, edge_type in edges:
+        source, target = encode_basestring(source), encode_basestring(target)
+        handle.write(f'{separator}{{"source": {source}, "target": {target}, "type": "{edge_type}"}}')
+        separator = ",\n"
+    handle.write("\n]}\n")
+
+
+GRAPH_WRITERS = {"dot": write_dot, "gexf": write_gexf, "json": write_json}
+
+
+def iso_date(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a YYYY-MM-DD date, got {text!r}") from None
+
+
+def export_graph(args: argparse.Namespace, posts: List[dict], handle: TextIO) -> None:
+    posts_by_rkey = {post["rkey"]: post for post in posts}
+    selected: Optional[Set[str]] = None
+    if args.rkey:
+        target = posts_by_rkey.get(args.rkey)
+        if not target:
+            raise SystemExit(f"Could not find post with rkey {args.rkey}")
+        selected = collect_network(target, posts_by_rkey, *build_relationships(posts))
+
+    # createdAt starts with the same zero-padded YYYY-MM-DD, so the parsed
+    # bounds compare correctly as strings
+    since = args.since.isoformat() if args.since else None
+    until = args.until.isoformat() if args.until else None
+
+    def keep(post: dict) -> bool:
+        day = post.get("createdAt", "")[:10]
+        return (
+            (selected is None or post["rkey"] in selected)
+            and (since is None or day >= since)
+            and (until is None or day <= until)
+        )
+
+    nodes = (post for post in posts if keep(post))
+    edges = graph_edges(posts, posts_by_rkey, keep)
+    GRAPH_WRITERS[args.format](handle, nodes, edges)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
-        description="Create a Mermaid flowchart capturing replies and quotes for a post.",
+        description="Create a Mermaid flowchart capturing replies and quotes for a post, "
+        "or export the account's reply/quote graph as DOT, GEXF or JSON.",
     )
     parser.add_argument(
         "directory",
@@ -193,15 +359,47 @@ def main() -> None:
     )
     parser.add_argument(
         "rkey",
-        help="Record key of the post to visualize (e.g. 3jtc66csqyr2o).",
+        nargs="?",
+        help="Record key of the post to visualize (e.g. 3jtc66csqyr2o). Required for "
+        "Mermaid; for other formats, limits the export to that post's network.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("mermaid", *GRAPH_WRITERS),
+        default="mermaid",
+        help="Output format (default: mermaid). dot, gexf and json stream the whole "
+        "account's graph for tools such as Graphviz or Gephi.",
+    )
+    parser.add_argument(
+        "--since",
+        type=iso_date,
+        help="With dot/gexf/json, only include posts on or after this date (YYYY-MM-DD).",
+    )
+    parser.add_argument(
+        "--until",
+        type=iso_date,
+        help="With dot/gexf/json, only include posts on or before this date (YYYY-MM-DD).",
     )
     parser.add_argument(
         "--output",
-        help="Optional file path to write the Mermaid diagram instead of stdout.",
+        help="Optional file path to write the diagram or graph instead of stdout.",
     )
     args = parser.parse_args()
+    if args.format == "mermaid" and not args.rkey:
+        parser.error("rkey is required for Mermaid output")
+    if args.format == "mermaid" and (args.since or args.until):
+        parser.error("--since/--until require dot, gexf or json")
 
     posts = read_posts(args.directory)
+
+    if args.format != "mermaid":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                export_graph(args, posts, handle)
+        else:
+            export_graph(args, posts, sys.stdout)
+        return
+
     posts_by_rkey = {post["rkey"]: post for post in posts}
 
     target = posts_by_rkey.get(args.rkey)
@@ -1,7 +1,12 @@
+import argparse
 import json
+import multiprocessing
 import os
+import re
 import sys
 
+from post_index import PostIndex, parse_size, quoted_key
+
 def read_json(filename):
 	with open(filename, 'r') as file:
 		return json.load(file)
@@ -31,46 +36,42 @@ def read_posts_from_directory(directory, limit=None):
 		posts = posts[-limit:]
 	return posts
 
+def render_text(post):
+	# Inline links and media descriptions into the post's text
+	if 'facets' in post:
+		post['text'] = transform_text_to_markdown(post['text'], post['facets'])
+
+	if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.images":
+		images_text = '\n'.join([f"[{image['alt']}]" for image in post['embed']['images']])
+		post['text'] += f"\n{images_text}"
+
+	if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.external":
+		embed = post['embed']['external']
+		post['text'] += f"\n[{embed['title']}]({embed['uri']})"
+
+	if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.recordWithMedia":
+		media = post['embed']['media']
+		if media['$type'] == "app.bsky.embed.images":
+			images_text = '\n'.join([f"[{image['alt']}]" for image in media['images']])
+			post['text'] += f"\n{images_text}"
+		elif media['$type'] == "app.bsky.embed.external":
+			embed = media['external']
+			post['text'] += f"\n[{embed['title']}]({embed['uri']})"
+
 def process_posts(posts):
 	posts_by_rkey = {post['rkey']: post for post in posts}
 
 	for post in posts:
 		post['replies'] = []
-		if 'facets' in post:
-			post['text'] = transform_text_to_markdown(post['text'], post['facets'])
+		render_text(post)
 
-		if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.images":
-			images_text = '\n'.join([f"[{image['alt']}]" for image in post['embed']['images']])
-			post['text'] += f"\n{images_text}"
-
-		if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.external":
-			embed = post['embed']['external']
-			post['text'] += f"\n[{embed['title']}]({embed['uri']})"
-
-		if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.record":
-			quoted_rkey = post['embed']['record']['uri'].split('/')[-1]
-			if quoted_rkey in posts_by_rkey:
-				quoted_post = posts_by_rkey[quoted_rkey]
-				date = quoted_post['createdAt'].split('T')[0]
-				# Store raw quoted text
-				post['quotedText'] = quoted_post['text']
-				post['quotedDate'] = date
-
-		if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.recordWithMedia":
-			media = post['embed']['media']
-			if media['$type'] == "app.bsky.embed.images":
-				images_text = '\n'.join([f"[{image['alt']}]" for image in media['images']])
-				post['text'] += f"\n{images_text}"
-			elif media['$type'] == "app.bsky.embed.external":
-				embed = media['external']
-				post['text'] += f"\n[{embed['title']}]({embed['uri']})"
-
-			quoted_rkey = post['embed']['record']['record']['uri'].split('/')[-1]
-			if quoted_rkey in posts_by_rkey:
-				quoted_post = posts_by_rkey[quoted_rkey]
-				date = quoted_post['createdAt'].split('T')[0]
-				post['quotedText'] = quoted_post['text']
-				post['quotedDate'] = date
+		quoted_rkey = quoted_key(post)
+		if quoted_rkey in posts_by_rkey:
+			quoted_post = posts_by_rkey[quoted_rkey]
+			date = quoted_post['createdAt'].split('T')[0]
+			# Store raw quoted text
+			post['quotedText'] = quoted_post['text']
+			post['quotedDate'] = date
 
 	# Process replies
 	for post in posts:
@@ -93,13 +94,7 @@ def process_posts(posts):
 	quoted_posts = set()
 	for post in filtered_posts:
 		if 'quotedText' in post:
-			quoted_rkey = None
-			if 'embed' in post and post['embed']['$type'] == "app.bsky.embed.record":
-				quoted_rkey = post['embed']['record']['uri'].split('/')[-1]
-			elif 'embed' in post and post['embed']['$type'] == "app.bsky.embed.recordWithMedia":
-				quoted_rkey = post['embed']['record']['record']['uri'].split('/')[-1]
-			if quoted_rkey and quoted_rkey in posts_by_rkey:
-				quoted_posts.add(quoted_rkey)
+			quoted_posts.add(quoted_key(post))
 
 	# Root posts are those that aren't replies to internal posts
 	# Also exclude posts that are quoted elsewhere but have no replies (to avoid duplication)
@@ -111,52 +106,239 @@ def process_posts(posts):
 	]
 	return root_posts
 
-def print_posts(posts):
-	last_root_date = [None]	# Tracks the date of the last root post
+def stream_root_posts(index):
+	# process_posts for archives that don't fit in memory: walks a sorted
+	# PostIndex and yields one root thread at a time, reading each post's JSON
+	# only when it is printed ('replies' is a lazy generator)
+	def load(row):
+		post = read_json(row['path'])
+		post['rkey'] = row['rkey']
+		render_text(post)
+		return post
 
-	def print_date_if_new(date):
-		# Print the date only if it's different from the last root post's date
-		if date != last_root_date[0]:
-			print()
-			print("## " + date)
-			last_root_date[0] = date
+	def is_external(row):
+		return row['parent'] is not None and row['parent_pos'] is None
 
-	def print_post(post, depth=0):
-		date = post['createdAt'].split('T')[0]
+	def is_quote_only(row, post=None):
+		# External replies that only contain quoted text are dropped everywhere
+		if not is_external(row) or row['quoted_pos'] is None:
+			return False
+		return not (post or load(row))['text'].strip()
+
+	def hydrate(row, post):
+		if row['quoted_pos'] is not None:
+			quoted = index.get(row['quoted_pos'])
+			quoted_post = read_json(quoted['path'])
+			# process_posts sees earlier posts already rendered, later ones raw
+			if quoted['pos'] <= row['pos']:
+				render_text(quoted_post)
+			post['quotedText'] = quoted_post['text']
+			post['quotedDate'] = quoted_post['createdAt'].split('T')[0]
+		if is_external(row):
+			post['external_reply'] = 1
+		post['replies'] = (hydrate(child, load(child)) for child in index.replies(row['pos']))
+		return post
+
+	for row in index.roots():
+		post = load(row)
+		if is_quote_only(row, post):
+			continue
+		# Quoted elsewhere with no replies: shown under the quoting post instead
+		if not index.has_replies(row['pos']) and any(
+				not is_quote_only(quoter) for quoter in index.quoters(row['pos'])):
+			continue
+		yield hydrate(row, post)
+
+def walk_thread(post, depth=0):
+	# A root post and all of its replies in print order, as plain
+	# (depth, text, date, external, quotedText, quotedDate) tuples. Walks the
+	# tree with an explicit stack so long self-reply chains can't hit the
+	# recursion limit, and pulls lazy 'replies' from stream_root_posts as it goes
+	stack = [(iter([post]), depth)]
+	while stack:
+		children, level = stack[-1]
+		child = next(children, None)
+		if child is None:
+			stack.pop()
+			continue
+		yield (level, child['text'], child['createdAt'].split('T')[0],
+			bool(child.get('external_reply')), child.get('quotedText'), child.get('quotedDate'))
+		stack.append((iter(child['replies']), level + 1))
+
+def flatten_thread(post, depth=0):
+	return list(walk_thread(post, depth))
+
+def thread_pieces(entries):
+	# Text of a thread piece by piece, without the blank lines and date
+	# heading that print_posts puts in front of each root post
+	for index, (depth, text, date, external, quoted_text, quoted_date) in enumerate(entries):
+		if index:
+			yield "\n\n" if external else "\n"
 		indent = ' ↳ ' * depth	# Adjust indent for replies
 
-		print()
-		if depth == 0 or post.get('external_reply'):
-			print()
-		if depth == 0:	# It's a root post
-			print_date_if_new(date)
-		print(f"{indent}{post['text']}", end="")
-		if depth != 0 and not post.get('external_reply'):
-			print(f" —{date}", end="")
-		if 'quotedText' in post:
-			quote_lines = post['quotedText'].split('\n')
+		yield f"{indent}{text}"
+		if depth != 0 and not external:
+			yield f" —{date}"
+		if quoted_text is not None:
+			quote_lines = quoted_text.split('\n')
 			quote_indent = ' ' * len(indent)
 			for line in quote_lines:
-				print(f"\n{quote_indent}> {line}", end="")
-			print(f" —{post['quotedDate']}", end="")
+				yield f"\n{quote_indent}> {line}"
+			yield f" —{quoted_date}"
+
+def format_entries(entries):
+	return "".join(thread_pieces(entries))
+
+def with_headings(threads):
+	# threads: (root post, payload) pairs. Pairs each payload with the blank
+	# lines and date heading that go before it; the date is printed only
+	# when it differs from the last root post's date
+	last_root_date = None
+	for post, payload in threads:
+		date = post['createdAt'].split('T')[0]
+		heading = ""
+		if not post.get('external_reply') and date != last_root_date:
+			heading = f"\n## {date}\n"
+			last_root_date = date
+		yield f"\n\n{heading}", payload
+
+def print_posts(posts):
+	# Streams each thread as it is walked, so memory follows reply depth
+	# rather than the size of the thread's text
+	for prefix, post in with_headings((post, post) for post in posts):
+		print(prefix, end="")
+		for piece in thread_pieces(walk_thread(post, post.get('external_reply', 0))):
+			print(piece, end="")
+
+RENDER_BATCH_BYTES = 64 << 20	# Text handed to the pool per round of write_chunks
+# A batch is alive ~4 times over in write_chunks: the flattened entries,
+# their pickles, the formatted texts coming back and the pickles of those
+BATCH_COPIES = 4
+ENTRY_OVERHEAD = 200	# Rough bytes per flattened post beyond its text
 
-		for reply in post['replies']:
-			print_post(reply, depth + 1)
+# Offline token estimate: one token per punctuation mark and per ~4 bytes of
+# each word, which tracks BPE tokenizers closely enough for budgeting
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
 
+def estimate_tokens(text):
+	return sum((len(word.encode('utf-8')) + 3) // 4 for word in TOKEN_RE.findall(text))
+
+def render_thread(thread):
+	# Worker: format one flattened root thread and measure it
+	root, entries = thread
+	text = format_entries(entries)
+	dates = [entry[2] for entry in entries]
+	# Budget for a date heading even if the chunk ends up not needing it
+	tokens = estimate_tokens(text) + estimate_tokens("## " + root['createdAt'])
+	return root, text, tokens, min(dates), max(dates)
+
+def thread_batches(posts, batch_bytes):
+	# Flatten root threads on this process and group them into batches of
+	# roughly batch_bytes, so workers only ever receive flat tuples of strings
+	batch, size = [], 0
 	for post in posts:
-		print_post(post, post.get('external_reply', 0))
+		root = {'createdAt': post['createdAt'], 'external_reply': post.get('external_reply', 0)}
+		entries = flatten_thread(post, root['external_reply'])
+		batch.append((root, entries))
+		size += sum(len(entry[1]) + len(entry[4] or "") + ENTRY_OVERHEAD for entry in entries)
+		if size >= batch_bytes:
+			yield batch
+			batch, size = [], 0
+	if batch:
+		yield batch
+
+def chunk_header(name, part, first, last):
+	return f"# {name}: posts {first} to {last} (part {part})\n"
+
+def write_chunks(posts, name, chunk_dir, max_tokens, jobs, batch_bytes=RENDER_BATCH_BYTES):
+	# Pack whole root threads, in order, into files of at most max_tokens
+	# (by estimate_tokens). A thread larger than the budget gets a file to itself.
+	os.makedirs(chunk_dir, exist_ok=True)
+	header_tokens = estimate_tokens(chunk_header(name, 99999, "0000-00-00", "0000-00-00"))
+	chunk, tokens, parts = [], header_tokens, 0
+
+	def flush():
+		nonlocal parts
+		parts += 1
+		first = min(thread[3] for thread in chunk)
+		last = max(thread[4] for thread in chunk)
+		path = os.path.join(chunk_dir, f"part-{parts:04d}.txt")
+		with open(path, 'w', encoding='utf-8') as file:
+			file.write(chunk_header(name, parts, first, last))
+			for prefix, text in with_headings((root, text) for root, text, *_ in chunk):
+				file.write(prefix + text)
+			file.write("\n")
+
+	# Batches are loaded on this thread and capped in bytes, so a streamed
+	# PostIndex is never read far ahead of what is being rendered
+	with multiprocessing.Pool(jobs) as pool:
+		for batch in thread_batches(posts, batch_bytes):
+			chunksize = max(1, len(batch) // (jobs * 4))
+			for thread in pool.map(render_thread, batch, chunksize=chunksize):
+				if chunk and tokens + thread[2] > max_tokens:
+					flush()
+					chunk, tokens = [], header_tokens
+				if header_tokens + thread[2] > max_tokens:
+					print(f"Thread from {thread[3]} is ~{thread[2]} tokens, over the "
+						f"{max_tokens} budget; writing it whole", file=sys.stderr)
+				chunk.append(thread)
+				tokens += thread[2]
+		if chunk:
+			flush()
+	print(f"Wrote {parts} chunks of at most ~{max_tokens} tokens to {chunk_dir}", file=sys.stderr)
+
+def print_header(profile):
+	print(profile['displayName'])
+	print()
+	print(profile['description'])
+
+def positive_int(text):
+	value = int(text)
+	if value <= 0:
+		raise argparse.ArgumentTypeError(f"must be a positive integer, got {text}")
+	return value
+
+def export(args, root_posts, batch_bytes=RENDER_BATCH_BYTES):
+	profile_path = os.path.join(args.directory, "app.bsky.actor.profile", "self.json")
+	profile = read_json(profile_path)
 
-directory = sys.argv[1]
-limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
-posts = read_posts_from_directory(os.path.join(directory, "app.bsky.feed.post"), limit)
+	if args.chunk_dir:
+		write_chunks(root_posts, profile['displayName'], args.chunk_dir,
+			args.chunk_tokens, args.jobs, batch_bytes)
+	else:
+		print_header(profile)
+		print_posts(root_posts)
 
-root_posts = process_posts(posts)
+def main():
+	parser = argparse.ArgumentParser(
+		description="Print a Bluesky repo export as threaded, quoted plain text.")
+	parser.add_argument("directory", help="DID folder from the unpacked .car export")
+	parser.add_argument("limit", nargs="?", type=int, help="Only include the most recent N posts")
+	parser.add_argument("--max-memory", type=parse_size,
+		help="Stream threads from an on-disk index instead of loading every post "
+			"(e.g. 512M, 2G). Output is identical to the default in-memory mode. This "
+			"sizes the index cache and --chunk-dir render batches; it is not a hard cap, "
+			"since the interpreter, the posts along the deepest reply chain and, with "
+			"--chunk-dir, each thread's formatted text come on top.")
+	parser.add_argument("--chunk-dir",
+		help="Write part-NNNN.txt files of whole threads here instead of printing to stdout")
+	parser.add_argument("--chunk-tokens", type=positive_int, default=100000,
+		help="Estimated token budget per chunk file (default: 100000)")
+	parser.add_argument("--jobs", type=positive_int, default=os.cpu_count(),
+		help="Worker processes used to render chunks (default: all cores)")
+	args = parser.parse_args()
+	post_dir = os.path.join(args.directory, "app.bsky.feed.post")
 
-profile_path = os.path.join(directory, "app.bsky.actor.profile", "self.json")
-profile = read_json(profile_path)
+	if args.max_memory:
+		with PostIndex(post_dir, args.max_memory) as index:
+			index.sort(args.limit)
+			# Render batches get what SQLite leaves, split across their copies
+			batch_bytes = max((args.max_memory - index.sqlite_budget) // BATCH_COPIES, 1)
+			export(args, stream_root_posts(index), batch_bytes)
+		return
 
-print(profile['displayName'])
-print()
-print(profile['description'])
+	posts = read_posts_from_directory(post_dir, args.limit)
+	export(args, process_posts(posts))
 
-print_posts(root_posts)
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Summarize reply and quote structure across a whole Bluesky archive."""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from thread_graph import parent_rkey, quoted_rkeys
+
+PERCENTILES = (50, 90, 99)
+REPLY_DELAY_EDGES = (0, 60, 300, 900, 3600, 21600, 86400, 604800, np.inf)
+REPLY_DELAY_LABELS = ("<1m", "1m-5m", "5m-15m", "15m-1h", "1h-6h", "6h-1d", "1d-7d", ">=7d")
+MISSING_TIME = np.iinfo(np.int64).min  # NaT as int64
+
+
+def read_links(directory: str) -> Tuple[np.ndarray, ...]:
+    """Return rkey, createdAt, parent rkey and quoted rkey of every post.
+
+    Only these four fields are kept, so millions of posts fit comfortably in
+    memory. Missing parents/quotes are empty strings.
+    """
+    post_dir = os.path.join(directory, "app.bsky.feed.post")
+    if not os.path.isdir(post_dir):
+        raise FileNotFoundError(f"Could not find app.bsky.feed.post under {directory}")
+
+    rkeys, created, parents, quotes = [], [], [], []
+    for root, _dirs, files in os.walk(post_dir):
+        for filename in files:
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(root, filename), "r", encoding="utf-8") as handle:
+                post = json.load(handle)
+            quoted = quoted_rkeys(post)
+            rkeys.append(os.path.splitext(filename)[0])
+            created.append(post.get("createdAt", ""))
+            parents.append(parent_rkey(post) or "")
+            quotes.append(quoted[0] if quoted else "")
+
+    return np.array(rkeys), np.array(created), np.array(parents), np.array(quotes)
+
+
+def index_of(keys: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Position of each target in keys, or -1 where it is not in the archive."""
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    slots = np.minimum(np.searchsorted(sorted_keys, targets), len(keys) - 1)
+    return np.where(sorted_keys[slots] == targets, order[slots], -1)
+
+
+def relationship_arrays(
+    rkeys: np.ndarray,
+    created: np.ndarray,
+    parents: np.ndarray,
+    quotes: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Integer-indexed reply/quote graph with posts ordered by createdAt.
+
+    ``parent`` and ``quote`` hold indices into the same arrays, or -1 when the
+    target is not in the archive (the same rule build_relationships uses).
+    ``replied`` marks every reply, including replies to outside posts, and
+    ``timestamp`` is microseconds since the epoch (UTC), which covers
+    backdated years like 0001; missing or unparsable createdAt values are
+    MISSING_TIME and sort first.
+    """
+    timestamps = pd.to_datetime(created, utc=True, format="ISO8601", errors="coerce")
+    timestamps = timestamps.as_unit("us").asi8
+    order = np.argsort(timestamps, kind="stable")
+    rkeys = rkeys[order]
+    return {
+        "parent": index_of(rkeys, parents[order]),
+        "quote": index_of(rkeys, quotes[order]),
+        "replied": parents[order] != "",
+        "timestamp": timestamps[order],
+    }
+
+
+def climb(link: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Follow ``link`` (-1 = none) to the top for every post at once.
+
+    Uses pointer doubling, so a chain of depth d takes log2(d) vector steps.
+    Returns the topmost ancestor of each post and the number of hops to it.
+    """
+    top = np.where(link >= 0, link, np.arange(len(link)))
+    hops = (link >= 0).astype(np.int64)
+    for _ in range(64):
+        above = top[top]
+        if np.array_equal(above, top):
+            break
+        hops = hops + hops[top]
+        top = above
+    return top, hops
+
+
+def summarize(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {"count": 0}
+    summary = {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), 3),
+        "min": values.min().item(),
+    }
+    for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{pct}"] = round(float(value), 3)
+    summary["max"] = values.max().item()
+    return summary
+
+
+def int_distribution(values: np.ndarray) -> dict:
+    counts = np.bincount(values) if len(values) else np.zeros(0, dtype=np.int64)
+    present = np.flatnonzero(counts)
+    summary = summarize(values)
+    summary["histogram"] = {str(value): int(counts[value]) for value in present}
+    return summary
+
+
+def compute_stats(arrays: Dict[str, np.ndarray]) -> dict:
+    parent = arrays["parent"]
+    quote = arrays["quote"]
+    timestamp = arrays["timestamp"]
+    count = len(parent)
+
+    # Threads: every post that isn't a reply to an archived post is a root
+    is_reply = parent >= 0
+    root, depth = climb(parent)
+    thread_size = np.bincount(root, minlength=count)[~is_reply]
+
+    # Quote cascades: chains of posts quoting posts, grouped by the original
+    is_quote = quote >= 0
+    fan_out = np.bincount(quote[is_quote], minlength=count)
+    origin, quote_depth = climb(quote)
+    cascade_size = np.bincount(origin, minlength=count)
+    is_origin = ~is_quote & (cascade_size > 1)
+
+    # Posts are in time order, so the first occurrence of a parent among the
+    # replies is its earliest reply. Posts without a usable createdAt are
+    # left out on both sides.
+    has_time = timestamp != MISSING_TIME
+    replies = np.flatnonzero(is_reply & has_time)
+    answered, first = np.unique(parent[replies], return_index=True)
+    timed = has_time[answered]
+    answered, first = answered[timed], first[timed]
+    delay = (timestamp[replies[first]] - timestamp[answered]) / 1e6
+    # Clock skew can put a reply before its parent; count it as an instant
+    # reply in both the summary and histogram, and report how many there were
+    skewed = int((delay < 0).sum())
+    delay = np.maximum(delay, 0)
+    delay_counts, _ = np.histogram(delay, bins=REPLY_DELAY_EDGES)
+    time_to_first_reply = summarize(delay)
+    time_to_first_reply["clock_skewed"] = skewed
+    time_to_first_reply["histogram"] = dict(zip(REPLY_DELAY_LABELS, map(int, delay_counts)))
+
+    replied = int(arrays["replied"].sum())
+    self_replies = int(is_reply.sum())
+    return {
+        "posts": {
+            "total": count,
+            "threads": int((~is_reply).sum()),
+            "missing_created_at": int((~has_time).sum()),
+        },
+        "replies": {
+            "total": replied,
+            "self": self_replies,
+            "external": replied - self_replies,
+            "self_ratio": round(self_replies / replied, 4) if replied else 0.0,
+        },
+        "quotes": {
+            "total": int(is_quote.sum()),
+            "quoted_posts": int((fan_out > 0).sum()),
+            "cascades": int(is_origin.sum()),
+        },
+        "thread_size": int_distribution(thread_size),
+        "reply_depth": int_distribution(depth[is_reply]),
+        "quote_fan_out": int_distribution(fan_out[fan_out > 0]),
+        "quote_cascade_size": int_distribution(cascade_size[is_origin]),
+        "quote_cascade_depth": int_distribution(quote_depth[is_quote]),
+        "time_to_first_reply_seconds": time_to_first_reply,
+    }
+
+
+def write_csv(stats: dict, handle) -> None:
+    writer = csv.writer(handle, lineterminator="\n")
+    writer.writerow(["metric", "statistic", "value"])
+    for metric, values in stats.items():
+        for statistic, value in values.items():
+            if isinstance(value, dict):
+                for bucket, bucket_count in value.items():
+                    writer.writerow([metric, f"{statistic}:{bucket}", bucket_count])
+            else:
+                writer.writerow([metric, statistic, value])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compute thread, reply and quote statistics for a whole archive.",
+    )
+    parser.add_argument(
+        "directory",
+        help="Path to the DID folder that contains app.bsky.feed.post",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "csv"),
+        default="json",
+        help="Summary format (default: json). CSV is long-form metric,statistic,value.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Optional file path to write the summary instead of stdout.",
+    )
+    args = parser.parse_args()
+
+    rkeys, created, parents, quotes = read_links(args.directory)
+    if not len(rkeys):
+        raise SystemExit(f"No posts found under {args.directory}")
+
+    stats = compute_stats(relationship_arrays(rkeys, created, parents, quotes))
+
+    handle = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            write_csv(stats, handle)
+        else:
+            json.dump(stats, handle, indent=2)
+            handle.write("\n")
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+
+
+if __name__ == "__main__":
+    main()